@@ -1,8 +1,15 @@
+import asyncio
 import requests
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+import hashlib
 import json
+import orjson
 import os
+import tempfile
+import threading
 import logging
+from collections import OrderedDict
 
 logger = logging.getLogger("DataPipelineBuilder")
 
@@ -12,46 +19,141 @@ load_dotenv()
 MODEL = os.getenv("MODEL")
 OLLAMA_URL = os.getenv("OLLAMA_URL")
 
-def generate_spark_job(instruction: str):
-    prompt = f"""
-        You are an expert data engineer. 
-        Write clean, production ready PySpark code for the following instruction:\n{instruction}
-
-        Requirements:
-        -- Use Spark best practices
-        -- Add minimal but clear comments
-        -- Do not include example data
-        -- Return only valid python code
-    """
+### Shared HTTP session so generation and ruff-fix retries reuse the
+### keep-alive connection to Ollama instead of reconnecting per request.
+_SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+_SESSION.mount("http://", _adapter)
+_SESSION.mount("https://", _adapter)
+
+### Generation limits sent with every request. Capping the decode length and
+### context keeps each call bounded; a low temperature keeps retries stable.
+OLLAMA_OPTIONS = {
+    "num_predict": 1024,
+    "num_ctx": 4096,
+    "temperature": 0.2,
+}
+
+### Generated jobs are cached per (model, prompt, options) in memory and on disk,
+### so re-running the same instruction skips the LLM call entirely.
+GENERATION_CACHE_DIR = os.getenv("GENERATION_CACHE_DIR", os.path.join(".cache", "spark_gen"))
+GENERATION_CACHE_SIZE = 256
+_GENERATION_CACHE = OrderedDict()
+_GENERATION_CACHE_LOCK = threading.Lock()
+
+
+def _generation_cache_key(prompt: str, model: str):
+    key_source = json.dumps([model, prompt, OLLAMA_OPTIONS], sort_keys=True)
+    return hashlib.blake2b(key_source.encode(), digest_size=16).hexdigest()
+
+
+def _load_cached_generation(key: str):
+    with _GENERATION_CACHE_LOCK:
+        result = _GENERATION_CACHE.get(key)
+        if result is not None:
+            _GENERATION_CACHE.move_to_end(key)
+            return result
+    try:
+        with open(os.path.join(GENERATION_CACHE_DIR, f"{key}.txt"), encoding="utf-8") as f:
+            result = f.read()
+    except FileNotFoundError:
+        return None
+    _remember_generation(key, result)
+    return result
+
+
+def _remember_generation(key: str, result: str):
+    """Stores result under key, evicting the least recently used entry when full."""
+    with _GENERATION_CACHE_LOCK:
+        _GENERATION_CACHE[key] = result
+        _GENERATION_CACHE.move_to_end(key)
+        if len(_GENERATION_CACHE) > GENERATION_CACHE_SIZE:
+            _GENERATION_CACHE.popitem(last=False)
+
+
+def _is_cacheable(result: str):
+    """Only responses with an extractable code block that passes the safety scan are cached."""
+    ## Imported here: the validator imports this module lazily as well.
+    from agents.validator import UnsafeCodeError, check_safe, extract_python_code
+
+    try:
+        check_safe(extract_python_code(result))
+    except (ValueError, UnsafeCodeError) as e:
+        logger.info(f"Not caching LLM response: {e}")
+        return False
+    return True
+
+
+def _store_generation(key: str, result: str):
+    _remember_generation(key, result)
+    os.makedirs(GENERATION_CACHE_DIR, exist_ok=True)
+    path = os.path.join(GENERATION_CACHE_DIR, f"{key}.txt")
+    ## write-then-rename so a concurrent reader never sees a partial file; the
+    ## unique temp name keeps concurrent writers (threads or processes) apart
+    fd, temp_path = tempfile.mkstemp(dir=GENERATION_CACHE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(result)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def generate_spark_job(instruction: str, use_cache: bool = True):
+    prompt = (
+        "You are an expert data engineer. Write clean, production ready PySpark code for:\n"
+        f"{instruction}\n"
+        "Use Spark best practices and minimal comments, no example data. "
+        "Return only the code in a ```python fenced block."
+    )
     logger.debug(f"User Prompt: {prompt}")
+
+    key = _generation_cache_key(prompt, MODEL)
+    if use_cache:
+        cached = _load_cached_generation(key)
+        if cached is not None:
+            logger.info("Using cached LLM response for this instruction")
+            return cached
+
     llm_result = query_ollama(prompt, MODEL)
     logger.debug(f"LLM Response: {llm_result}")
+    if use_cache and _is_cacheable(llm_result):
+        _store_generation(key, llm_result)
     return llm_result
 
+
+async def generate_spark_job_async(instruction: str, use_cache: bool = True):
+    """Runs generate_spark_job on a worker thread so several jobs can be generated concurrently."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, generate_spark_job, instruction, use_cache)
+
+
 def query_ollama(prompt: str, model: str = MODEL):
-    payload = {"model": model, "prompt": prompt, "stream": False}
+    payload = {"model": model, "prompt": prompt, "stream": True, "options": OLLAMA_OPTIONS}
     logger.info(f"Querying Ollama {model} model located at {OLLAMA_URL}")
     logger.debug(f"Http POST Method with JSON Payload: {payload}")
-    response = requests.post(OLLAMA_URL, json=payload)
+    ## The context manager closes the streamed response (returning the pooled
+    ## connection) even if parsing fails or iteration stops early.
+    with _SESSION.post(OLLAMA_URL, json=payload, stream=True) as response:
+        if response.status_code != 200:
+            raise Exception(f"Ollama error {response.text}")
 
-    if response.status_code != 200:
-        raise Exception(f"Ollama error {response.text}")
-    
-    try:
         logger.debug(f"Response Status Code: {response.status_code}")
-        data = response.json()
-        return data.get("response", "").strip()
-    
-    except json.JSONDecodeError:
-        ## for somereason if the response comes in line-delimited.
-        ## Ollama’s /api/generate endpoint doesn’t always return a single JSON object — it streams multiple JSON chunks by default, 
-        # even if you set "stream": False
-
-        logger.debug(f"Ollama endpoint returned multiple JSON chunks instead of a single JSON object")
-        full_result = ""
-        for line in response.iter_lines():
+
+        ## Ollama's /api/generate endpoint streams line-delimited JSON chunks.
+        ## Parse each chunk once as it arrives (orjson decodes the raw bytes directly)
+        ## and join the pieces at the end instead of concatenating strings.
+        chunks = []
+        for line in response.iter_lines(decode_unicode=False):
             if not line:
                 continue
-            data = json.loads(line)
-            full_result += data.get("response", "")
-        return full_result
+            data = orjson.loads(line)
+            chunks.append(data.get("response", ""))
+    return "".join(chunks).strip()
+
+
+async def query_ollama_async(prompt: str, model: str = MODEL):
+    """Runs query_ollama on a worker thread so the event loop stays free while Ollama generates."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, query_ollama, prompt, model)
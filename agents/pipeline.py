@@ -0,0 +1,26 @@
+# pipeline.py
+import asyncio
+import logging
+
+from agents.code_generator import generate_spark_job_async
+from agents.validator import validate_generated_code_async
+
+logger = logging.getLogger("DataPipelineBuilder")
+
+
+async def generate_many(instructions: list, concurrency: int = 4):
+    """Generates and validates Spark jobs for several instructions concurrently.
+
+    At most `concurrency` jobs talk to Ollama at once; match it to the server's
+    OLLAMA_NUM_PARALLEL. Returns one entry per instruction, in order: the
+    validation result (True/False) or the exception raised for that job.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(instruction: str):
+        async with semaphore:
+            logger.info(f"Instruction for LLM: {instruction}")
+            llm_result = await generate_spark_job_async(instruction)
+            return await validate_generated_code_async(llm_result)
+
+    return await asyncio.gather(*(run_one(instruction) for instruction in instructions), return_exceptions=True)
@@ -0,0 +1,177 @@
+# ruff_server.py
+import atexit
+import itertools
+import json
+import logging
+import os
+import subprocess
+import threading
+
+logger = logging.getLogger("DataPipelineBuilder")
+
+## Upper bound in seconds for one LSP exchange; a stalled server is killed so
+## callers can fall back to the ruff CLI instead of hanging.
+REQUEST_TIMEOUT = 10
+
+
+class RuffServer:
+    """Long-lived `ruff server` process spoken to over LSP on stdio.
+
+    Linting through a running server avoids paying process startup and a
+    temporary file write for every code block.
+    """
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._documents = itertools.count(1)
+        self._lock = threading.Lock()
+        self._dead = False
+        self._process = subprocess.Popen(
+            ["ruff", "server"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._exchange(self._initialize)
+        logger.info("Started ruff language server")
+
+    def _initialize(self):
+        self._request("initialize", {
+            "processId": os.getpid(),
+            "rootUri": None,
+            "capabilities": {"textDocument": {"diagnostic": {}}},
+        })
+        self._notify("initialized", {})
+
+    def is_alive(self):
+        return not self._dead and self._process.poll() is None
+
+    def _kill(self):
+        """Kills and reaps the process so is_alive() is False right away."""
+        self._dead = True
+        self._process.kill()
+        self._process.wait()
+
+    def _exchange(self, func, *args):
+        """Runs one LSP exchange under REQUEST_TIMEOUT; on any failure the server is killed.
+
+        Killing the process unblocks a pending read or write, so a stalled
+        server surfaces as an error instead of a hang.
+        """
+        timed_out = threading.Event()
+
+        def on_timeout():
+            timed_out.set()
+            self._kill()
+
+        timer = threading.Timer(REQUEST_TIMEOUT, on_timeout)
+        timer.daemon = True
+        timer.start()
+        try:
+            return func(*args)
+        except (OSError, RuntimeError, ValueError) as e:
+            ## The stream is in an unknown state; kill the server so the next
+            ## get_ruff_server() call starts a fresh one.
+            self._kill()
+            if timed_out.is_set():
+                raise RuntimeError(f"ruff server did not answer within {REQUEST_TIMEOUT}s") from e
+            raise
+        finally:
+            timer.cancel()
+
+    # ----------------------- LSP transport -----------------------
+    def _send(self, message: dict):
+        body = json.dumps(message).encode()
+        self._process.stdin.write(b"Content-Length: %d\r\n\r\n" % len(body) + body)
+        self._process.stdin.flush()
+
+    def _receive(self):
+        length = None
+        while True:
+            header = self._process.stdout.readline()
+            if not header:
+                raise RuntimeError("ruff server closed its output stream")
+            header = header.strip()
+            if not header:
+                break
+            name, _, value = header.partition(b":")
+            if name.lower() == b"content-length":
+                length = int(value)
+        if length is None:
+            raise RuntimeError("ruff server sent a message without Content-Length")
+        return json.loads(self._process.stdout.read(length))
+
+    def _notify(self, method: str, params: dict):
+        self._send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def _request(self, method: str, params: dict):
+        request_id = next(self._ids)
+        self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+        while True:
+            message = self._receive()
+            if "method" in message:
+                ## Server-to-client requests (e.g. capability registration) need an answer;
+                ## notifications such as log messages are ignored.
+                if "id" in message:
+                    self._send({"jsonrpc": "2.0", "id": message["id"], "result": None})
+                continue
+            if message.get("id") != request_id:
+                continue
+            if "error" in message:
+                raise RuntimeError(f"ruff server error on {method}: {message['error']}")
+            return message.get("result")
+
+    # ------------------------- linting ---------------------------
+    def check(self, code: str):
+        """Lints a code block and returns (status, diagnostics) like run_ruff_lint."""
+        with self._lock:
+            uri = f"untitled:snippet_{next(self._documents)}.py"
+            report = self._exchange(self._lint_document, uri, code)
+
+        issues = []
+        for item in (report or {}).get("items", []):
+            start = item["range"]["start"]
+            ## LSP positions are zero based; report them the way the ruff CLI does.
+            message = item["message"].splitlines()[0]
+            issues.append(f"{start['line'] + 1}:{start['character'] + 1}: {item.get('code', '')} {message}")
+
+        if issues:
+            return False, "\n".join(issues)
+        return True, ""
+
+    def _lint_document(self, uri: str, code: str):
+        self._notify("textDocument/didOpen", {
+            "textDocument": {"uri": uri, "languageId": "python", "version": 1, "text": code},
+        })
+        report = self._request("textDocument/diagnostic", {"textDocument": {"uri": uri}})
+        self._notify("textDocument/didClose", {"textDocument": {"uri": uri}})
+        return report
+
+    def _shutdown(self):
+        self._request("shutdown", None)
+        self._notify("exit", None)
+        self._process.wait(timeout=REQUEST_TIMEOUT)
+
+    def close(self):
+        if not self.is_alive():
+            return
+        try:
+            with self._lock:
+                self._exchange(self._shutdown)
+        except Exception:
+            self._kill()
+
+
+_SERVER = None
+## Validation runs on several worker threads; only one of them may start the server.
+_SERVER_LOCK = threading.Lock()
+
+
+def get_ruff_server():
+    """Returns the shared ruff server, starting it on first use."""
+    global _SERVER
+    with _SERVER_LOCK:
+        if _SERVER is None or not _SERVER.is_alive():
+            _SERVER = RuffServer()
+            atexit.register(_SERVER.close)
+        return _SERVER
@@ -1,31 +1,53 @@
 # validator.py
 import ast
-import subprocess
-import tempfile
-from pathlib import Path
+import hashlib
+import json
+import sys
+import textwrap
+import threading
+from collections import OrderedDict
 import logging
 import re
-from agents.code_generator import query_ollama
 
 logger = logging.getLogger("DataPipelineBuilder")
 
 # ================= FORBIDDEN RULES ==========================
-FORBIDDEN_NAMES = {
+## Names are interned so membership tests against the (already interned)
+## identifiers produced by the parser can short-circuit on pointer equality.
+FORBIDDEN_NAMES = frozenset(sys.intern(name) for name in {
     "eval", "exec", "open", "compile", "__import__",
     "globals", "locals", "vars"
-}
+})
 
-FORBIDDEN_MODULES = {
+FORBIDDEN_MODULES = frozenset(sys.intern(name) for name in {
     "os", "sys", "subprocess", "importlib", "pathlib",
     "shutil", "socket", "requests", "http", "urllib", "ftplib",
     "paramiko", "psutil"
-}
+})
 
 FORBIDDEN_STRINGS = FORBIDDEN_NAMES | FORBIDDEN_MODULES
 
-FORBIDDEN_ATTRS = {
+FORBIDDEN_ATTRS = frozenset(sys.intern(name) for name in {
     "system", "popen", "run", "remove", "unlink"
-}
+})
+
+_FORBIDDEN_NAME_IDS = FORBIDDEN_NAMES | {"__builtins__"}
+
+## Every rule matches a whole identifier or a whole string literal, so source
+## text where none of these appear as a complete word can skip the AST scan.
+## Word boundaries keep names like `cost` or `running` from matching `os`/`run`.
+_FORBIDDEN_TOKENS = re.compile(r"\b(?:" + "|".join(
+    re.escape(token)
+    for token in sorted(FORBIDDEN_STRINGS | FORBIDDEN_ATTRS | _FORBIDDEN_NAME_IDS, key=len, reverse=True)
+) + r")\b")
+
+## Adjacent string literals ("ev" "al", f"e" f"val", or split across lines in
+## parentheses, possibly with comments between) are folded into one constant by
+## the parser, so a forbidden string never appears verbatim in the source. A
+## closing quote followed by only whitespace (space, tab, form feed, newlines) or
+## comments and then another opening quote sends the code down the full scan. This also matches '' and triple quotes,
+## which only costs the shortcut, never correctness.
+_ADJACENT_STRINGS = re.compile(r"[\"'](?:[ \t\f\r\n]|#[^\r\n]*)*[rRbBuUfF]{0,2}[\"']")
 
 
 # ================= EXCEPTION TYPE ==========================
@@ -34,86 +56,179 @@ class UnsafeCodeError(Exception):
     pass
 
 
-# ============ SAFE AST CHECKER ==============================
-class SafeASTChecker(ast.NodeVisitor):
-
-    def visit_Import(self, node):
-        for alias in node.names:
-            root = alias.name.split('.')[0]
-            if root in FORBIDDEN_MODULES:
-                raise UnsafeCodeError(f"Import of forbidden module: {alias.name}")
-        self.generic_visit(node)
+# ================= VALIDATION CACHE ========================
+## Retries after an LLM fix often hand back the exact same code block, so
+## parse trees and check results are cached by a digest of the source.
+VALIDATION_CACHE_SIZE = 128
 
-    def visit_ImportFrom(self, node):
-        if node.module:
-            root = node.module.split('.')[0]
-            if root in FORBIDDEN_MODULES:
-                raise UnsafeCodeError(f"Import from forbidden module: {node.module}")
-        self.generic_visit(node)
+# digest -> parsed ast.Module
+_AST_CACHE = OrderedDict()
+# digest -> (safe_ok, compile_ok, ruff_ok, ruff_diagnostics)
+_VALIDATION_CACHE = OrderedDict()
+## An LLM fix usually touches a few statements, so statements that already
+## passed the safety scan are remembered individually.
+SAFE_STATEMENT_CACHE_SIZE = 1024
+# digest of a top-level statement's source lines -> True
+_SAFE_STATEMENT_CACHE = OrderedDict()
+## The async pipeline runs checks on worker threads, which share these caches.
+_CACHE_LOCK = threading.Lock()
 
-    def visit_Name(self, node):
-        if node.id in FORBIDDEN_NAMES:
-            raise UnsafeCodeError(f"Forbidden name: {node.id}")
-        if node.id == "__builtins__":
-            raise UnsafeCodeError("Access to __builtins__ is forbidden")
-        self.generic_visit(node)
 
-    def visit_Attribute(self, node):
-        if isinstance(node.value, ast.Name):
-            module = node.value.id
-            attr = node.attr
+def _source_key(code: str) -> bytes:
+    """Content address of a code block."""
+    return hashlib.blake2b(code.encode(), digest_size=16).digest()
 
-            if module in FORBIDDEN_MODULES:
-                raise UnsafeCodeError(f"Forbidden module attribute access: {module}.{attr}")
 
-            if attr in FORBIDDEN_ATTRS:
-                raise UnsafeCodeError(f"Forbidden attribute/function access: {module}.{attr}")
+def _cache_get(cache: OrderedDict, key: bytes):
+    """Returns the cached value for key (or None) and marks it recently used."""
+    with _CACHE_LOCK:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+    return value
 
-        self.generic_visit(node)
 
-    def visit_Call(self, node):
-        # dynamic import via importlib
-        if isinstance(node.func, ast.Attribute):
-            if isinstance(node.func.value, ast.Name):
-                # importlib.import_module()
-                if node.func.value.id == "importlib":
-                    raise UnsafeCodeError("Dynamic imports via importlib are forbidden")
+def _cache_put(cache: OrderedDict, key: bytes, value, max_size: int = VALIDATION_CACHE_SIZE):
+    """Stores value under key, evicting the least recently used entry when full."""
+    with _CACHE_LOCK:
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > max_size:
+            cache.popitem(last=False)
 
-                module = node.func.value.id
-                attr = node.func.attr
 
-                if module in FORBIDDEN_MODULES:
-                    raise UnsafeCodeError(f"Forbidden module call: {module}.{attr}")
+# ============ SAFE AST CHECKER ==============================
+def parse_code(code: str):
+    """Parses code into an AST, reusing the tree if this source was parsed before."""
+    key = _source_key(code)
+    tree = _cache_get(_AST_CACHE, key)
+    if tree is None:
+        try:
+            logger.debug(f"Parsing code block using AST")
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            raise UnsafeCodeError(f"Syntax error: {e}")
+        _cache_put(_AST_CACHE, key, tree)
+    return tree
+
+
+def may_be_unsafe(code: str):
+    """Cheap text pre-check: False only if no forbidden-usage rule could match the code."""
+    ## The parser NFKC-normalises non-ASCII identifiers, and backslash escapes or
+    ## implicit concatenation can spell a forbidden name inside a string literal,
+    ## so only plain ASCII source without escapes or adjacent literals is eligible
+    ## for the shortcut.
+    if not code.isascii() or "\\" in code or _ADJACENT_STRINGS.search(code):
+        return True
+    return _FORBIDDEN_TOKENS.search(code) is not None
 
-                if attr in FORBIDDEN_ATTRS:
-                    raise UnsafeCodeError(f"Forbidden attribute/function call: {module}.{attr}")
 
-        self.generic_visit(node)
+def _statement_groups(tree: ast.Module, code: str):
+    """Yields (source, statements) for each run of top-level statements sharing lines.
 
-    def visit_Constant(self, node):
-        if isinstance(node.value, str) and node.value in FORBIDDEN_STRINGS:
-            raise UnsafeCodeError(f"Forbidden string literal: {node.value}")
-        self.generic_visit(node)
+    Statements on the same line (e.g. `a = 1; b = 2`) are grouped so that every
+    group owns whole source lines, including its decorators and any comments
+    before it. A group's safety verdict therefore depends only on its source.
+    """
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    start = 0
+    group, group_end = [], 0
+    for stmt in tree.body:
+        if group and stmt.lineno > group_end:
+            yield "\n".join(lines[start:group_end]), group
+            start, group = group_end, []
+        group.append(stmt)
+        group_end = max(group_end, stmt.end_lineno)
+    if group:
+        yield "\n".join(lines[start:]), group
+
+
+def _check_statements(statements: list):
+    """Raises UnsafeCodeError if any node under the given statements is forbidden."""
+    ## A flat ast.walk with exact type checks avoids NodeVisitor's per-node
+    ## method lookup and generic_visit recursion.
+    for statement in statements:
+        for node in ast.walk(statement):
+            node_type = type(node)
+
+            if node_type is ast.Name:
+                ## One set probe decides the common (allowed) case; the message is
+                ## only worked out once a forbidden name is found.
+                if node.id in _FORBIDDEN_NAME_IDS:
+                    if node.id == "__builtins__":
+                        raise UnsafeCodeError("Access to __builtins__ is forbidden")
+                    raise UnsafeCodeError(f"Forbidden name: {node.id}")
+
+            elif node_type is ast.Attribute:
+                if type(node.value) is ast.Name:
+                    module = node.value.id
+                    attr = node.attr
+
+                    if module in FORBIDDEN_MODULES:
+                        raise UnsafeCodeError(f"Forbidden module attribute access: {module}.{attr}")
+
+                    if attr in FORBIDDEN_ATTRS:
+                        raise UnsafeCodeError(f"Forbidden attribute/function access: {module}.{attr}")
+
+            elif node_type is ast.Call:
+                func = node.func
+                if type(func) is ast.Attribute and type(func.value) is ast.Name:
+                    # dynamic import via importlib.import_module()
+                    if func.value.id == "importlib":
+                        raise UnsafeCodeError("Dynamic imports via importlib are forbidden")
+
+                    module = func.value.id
+                    attr = func.attr
+
+                    if module in FORBIDDEN_MODULES:
+                        raise UnsafeCodeError(f"Forbidden module call: {module}.{attr}")
+
+                    if attr in FORBIDDEN_ATTRS:
+                        raise UnsafeCodeError(f"Forbidden attribute/function call: {module}.{attr}")
+
+            elif node_type is ast.Constant:
+                if type(node.value) is str and node.value in FORBIDDEN_STRINGS:
+                    raise UnsafeCodeError(f"Forbidden string literal: {node.value}")
+
+            elif node_type is ast.Import:
+                for alias in node.names:
+                    root = alias.name.split('.')[0]
+                    if root in FORBIDDEN_MODULES:
+                        raise UnsafeCodeError(f"Import of forbidden module: {alias.name}")
+
+            elif node_type is ast.ImportFrom:
+                if node.module:
+                    root = node.module.split('.')[0]
+                    if root in FORBIDDEN_MODULES:
+                        raise UnsafeCodeError(f"Import from forbidden module: {node.module}")
 
 
 def check_safe(code: str):
-    """Runs SafeASTChecker."""
-    try:
-        logger.debug(f"Parsing code block using AST")
-        tree = ast.parse(code)
-    except SyntaxError as e:
-        raise UnsafeCodeError(f"Syntax error: {e}")
+    """Scans the AST and raises UnsafeCodeError on forbidden usage.
 
-    checker = SafeASTChecker()
-    checker.visit(tree)
-    return True
+    Returns the parsed tree so later checks can reuse it instead of re-parsing.
+    Top-level statements whose source already passed are not walked again.
+    """
+    tree = parse_code(code)
+    if not may_be_unsafe(code):
+        logger.debug("No forbidden tokens found, skipping AST scan")
+        return tree
+
+    for source, statements in _statement_groups(tree, code):
+        key = _source_key(source)
+        if _cache_get(_SAFE_STATEMENT_CACHE, key):
+            continue
+        _check_statements(statements)
+        _cache_put(_SAFE_STATEMENT_CACHE, key, True, SAFE_STATEMENT_CACHE_SIZE)
+
+    return tree
 
 
 # ================== COMPILE CHECK ===========================
-def validate_compiles(code: str):
-    """Ensures the code compiles without syntax errors."""
+def validate_compiles(tree: ast.Module):
+    """Ensures the already-parsed code compiles without syntax errors."""
     try:
-        compile(code, "<string>", "exec")
+        compile(tree, "<string>", "exec")
     except SyntaxError as e:
         raise UnsafeCodeError(f"Code failed to compile: {e}")
     return True
@@ -121,40 +236,63 @@ def validate_compiles(code: str):
 # ================ RUFF FIX PROMPT =========================
 def get_ruff_fix_prompt(code: str, ruff_output: str):
     """ Builds prompt for ruff found issues """
-    return f"""
-    You previously generated this PySpark code:
-
-    ```python
-    {code}
-    ```
-    Ruff reported the following issues:
-    {ruff_output}
-    Please fix ALL ruff issues.
-    Return only the corrected Python code inside a ```python fenced block with no explanation.
-    """
+    return (
+        f"You previously generated this PySpark code:\n```python\n{code.rstrip()}\n```\n"
+        f"Ruff reported these issues:\n{ruff_output}\n"
+        "Fix ALL of them. Return only the corrected code in a ```python fenced block, no explanation."
+    )
 
 # ==================== RUFF LINTING ==========================
 def run_ruff_lint(code: str):
-    """Runs `ruff` linting on a temporary file."""
-    with tempfile.NamedTemporaryFile("w", delete=False, suffix=".py") as f:
-        f.write(code)
-        temp_path = f.name
+    """Runs `ruff` linting on a single code block through the shared ruff server."""
+    ## Deferred so importing the validator does not pull in subprocess machinery
+    ## when results come from the cache.
+    from agents.ruff_server import get_ruff_server
+
+    try:
+        status, diagnostics = get_ruff_server().check(code)
+    except (OSError, RuntimeError, ValueError) as e:
+        logger.warning(f"Ruff server unavailable, falling back to ruff CLI: {e}")
+        return run_ruff_lint_stdin(code)
+
+    if not status:
+        logger.info(f"Ruff lint errors: \n{diagnostics}")
+    return status, diagnostics
 
-    cmd = ["ruff", "check", temp_path, "--quiet"]
-    process = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
 
-    diagnostics = process.stdout
+def run_ruff_lint_stdin(code: str):
+    """Runs the `ruff` CLI on a single code block piped through stdin (no temporary file)."""
+    import subprocess
 
+    cmd = ["ruff", "check", "--stdin-filename", "snippet.py", "--output-format=json", "--quiet", "-"]
+    process = subprocess.run(cmd, input=code, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    _check_ruff_returncode(process)
+
+    issues = [_format_ruff_issue(issue) for issue in json.loads(process.stdout or "[]")]
+    return _ruff_result(issues)
+
+
+def _check_ruff_returncode(process):
     # Ruff exit code:
     # 0 = no issues
     # 1 = lint issues found
     # >1 = ruff internal error
-    
-    if process.returncode != 0:
-        logger.info(f"Ruff lint errors: \n{process.stdout}")
+    if process.returncode > 1:
+        raise RuntimeError(f"Ruff failed with exit code {process.returncode}: {process.stderr}")
+
+
+def _format_ruff_issue(issue: dict):
+    location = issue["location"]
+    return f"{location['row']}:{location['column']}: {issue['code']} {issue['message']}"
+
+
+def _ruff_result(issues: list):
+    """Turns formatted ruff issues into the (status, diagnostics) pair used by the pipeline."""
+    if issues:
+        diagnostics = "\n".join(issues)
+        logger.info(f"Ruff lint errors: \n{diagnostics}")
         return False, diagnostics
-    else:
-        return True, ""
+    return True, ""
 
 
 # ================= SPARK-SPECIFIC CHECK =====================
@@ -170,35 +308,214 @@ def validate_spark_usage(code: str):
     return True
 
 # =================== EXTRACT PYTHON CODE ======================
+## LLMs label python blocks in many ways (or not at all), so any fence is
+## matched and its language tag is checked afterwards. The tag may be followed
+## by a newline (LF or CRLF) or, for one-line blocks, by spaces and the code.
+_CODE_FENCE = re.compile(r"```[ \t]*([A-Za-z0-9+#_-]*)(?:[ \t]*\r?\n|[ \t]+)(.*?)```", re.DOTALL)
+_CODE_FENCE_HEADER = re.compile(r"[ \t]*([A-Za-z0-9+#_-]*)(?:[ \t]*\r?\n|[ \t]+)")
+## A markdown indented code block starts at the beginning of the text or right
+## after a blank line; indented lines directly under other text (e.g. the body
+## of an unfenced `def`) are not code blocks.
+_INDENTED_BLOCK = re.compile(r"(?:\A|^[ \t]*\r?\n)((?: {4}.*(?:\r?\n|\Z))+)", re.MULTILINE)
+
+PYTHON_FENCE_TAGS = frozenset({
+    "python", "py", "python3", "cpython", "pyspark", "ipython"
+})
+
+## On very large LLM outputs the lazy `.*?` of the regex advances one character
+## at a time; above this size fences are located with str.find instead.
+LARGE_OUTPUT_THRESHOLD = 64 * 1024
+
+
+def _pick_block(tag: str, block: str, blocks: dict):
+    """Records block as the latest python-tagged or bare block, by its fence tag."""
+    tag = tag.lower()
+    if tag in PYTHON_FENCE_TAGS:
+        blocks["python"] = block
+    elif not tag:
+        blocks["bare"] = block
+
+
+def _find_last_code_block(code: str):
+    """str.find based scan returning the same block as the _CODE_FENCE based search."""
+    blocks = {}
+    pos = code.find("```")
+    while pos != -1:
+        header = _CODE_FENCE_HEADER.match(code, pos + 3)
+        if header is None:
+            pos = code.find("```", pos + 1)
+            continue
+
+        start = header.end()
+        end = code.find("```", start)
+        if end == -1:
+            break
+        _pick_block(header.group(1), code[start:end], blocks)
+        pos = code.find("```", end + 3)
+
+    return blocks.get("python", blocks.get("bare"))
+
+
+def _find_last_indented_block(code: str):
+    """Returns the last indented markdown code block outside any fence, dedented."""
+    ## Drop closed fenced blocks and everything from an unclosed fence onwards,
+    ## so lines of a truncated fenced block are never taken for a code block.
+    pieces = []
+    pos = 0
+    for match in _CODE_FENCE.finditer(code):
+        pieces.append(code[pos:match.start()])
+        pos = match.end()
+    rest = code[pos:]
+    unclosed = rest.find("```")
+    pieces.append(rest if unclosed == -1 else rest[:unclosed])
+
+    last_match = None
+    for last_match in _INDENTED_BLOCK.finditer("\n".join(pieces)):
+        pass
+    if last_match is None:
+        return None
+    return textwrap.dedent(last_match.group(1))
+
+
 def extract_python_code(code: str):
-    """Extract pure python code from LLM output."""
-    
-    python_block = re.findall(r"```(?:python|py|Python)\s?(.*?)```", code, re.DOTALL)
-    result = python_block.pop()
+    """Extract pure python code from LLM output.
+
+    Uses the last python-tagged fenced block; bare fences are used only when no
+    block is tagged as python, and indented blocks only when there are no fences.
+    """
+
+    if len(code) > LARGE_OUTPUT_THRESHOLD:
+        result = _find_last_code_block(code)
+    else:
+        ## Only the last block of each kind is used, so keep running results
+        ## instead of building the full list of blocks.
+        blocks = {}
+        for match in _CODE_FENCE.finditer(code):
+            _pick_block(match.group(1), match.group(2), blocks)
+        result = blocks.get("python", blocks.get("bare"))
+
+    if result is None:
+        logger.debug("No fenced python block found, looking for an indented block")
+        result = _find_last_indented_block(code)
+
+    if result is None:
+        raise ValueError("No python code block found in LLM output")
+
     logger.debug(f"Extracted Python Code: \n {result}")
     return result
 
 # ============ FULL VALIDATION PIPELINE =====================
+## Upper bound on ruff-fix round trips to the LLM for a single job.
+MAX_FIX_RETRIES = 3
 
-def validate_generated_code(code: str):
 
-    python_code = extract_python_code(code)
+def _run_checks(python_code: str):
+    """Runs safety, compile and ruff checks (or reuses cached results); returns (status, diagnostics)."""
+    key = _source_key(python_code)
+    cached = _cache_get(_VALIDATION_CACHE, key)
+    if cached is not None:
+        logger.info("Found cached validation results for this code block")
+        _, _, status, diagnostics = cached
+        return status, diagnostics
 
-    check_safe_result = check_safe(python_code)
-    if check_safe_result:
-        logger.info("SafeASTChecker completed successfully")
+    tree = check_safe(python_code)
+    logger.info("SafeASTChecker completed successfully")
 
-    compile_check_result = validate_compiles(python_code)
+    compile_check_result = validate_compiles(tree)
     if compile_check_result:
         logger.info("Compliation Successfull")
-        
+
     status, diagnostics = run_ruff_lint(python_code)
-    if status:
-        logger.info("No ruff lint suggestions found.")
-        logger.info(f"Generated production ready code:\n {python_code}")
-        return True
-    else:
+    _cache_put(_VALIDATION_CACHE, key, (True, compile_check_result, status, diagnostics))
+    return status, diagnostics
+
+
+def validate_generated_code(code: str, max_retries: int = MAX_FIX_RETRIES):
+    """Validates LLM output, asking the LLM to fix ruff issues up to max_retries times."""
+    ## Imported here so the validator can be loaded without the HTTP client stack.
+    from agents.code_generator import MODEL, query_ollama
+
+    python_code = extract_python_code(code)
+
+    for attempt in range(max_retries + 1):
+        status, diagnostics = _run_checks(python_code)
+        if status:
+            logger.info("No ruff lint suggestions found.")
+            logger.info(f"Generated production ready code:\n {python_code}")
+            return True
+
         logger.info(f"Found ruff lint suggestions as follows: {diagnostics}\n")
+        if attempt == max_retries:
+            break
+
+        logger.info(f"Requesting ruff fixes from LLM (attempt {attempt + 1} of {max_retries})")
         new_prompt = get_ruff_fix_prompt(python_code, diagnostics)
-        llm_result = query_ollama(new_prompt)
-        validate_generated_code(llm_result)
\ No newline at end of file
+        llm_result = query_ollama(new_prompt, MODEL)
+        python_code = extract_python_code(llm_result)
+
+    logger.warning(f"Ruff issues remain after {max_retries} fix attempts")
+    return False
+
+
+# ============ ASYNC VALIDATION PIPELINE ====================
+## asyncio is imported inside the async helpers so sync-only callers skip its import cost.
+async def _run_in_thread(func, *args):
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+def _check_safe_and_compile(python_code: str):
+    """Runs check_safe and compiles the tree it returns."""
+    return validate_compiles(check_safe(python_code))
+
+
+async def _run_checks_async(python_code: str):
+    """Async variant of _run_checks running the AST checks and ruff concurrently on worker threads."""
+    import asyncio
+
+    key = _source_key(python_code)
+    cached = _cache_get(_VALIDATION_CACHE, key)
+    if cached is not None:
+        logger.info("Found cached validation results for this code block")
+        _, _, status, diagnostics = cached
+        return status, diagnostics
+
+    compile_check_result, (status, diagnostics) = await asyncio.gather(
+        _run_in_thread(_check_safe_and_compile, python_code),
+        _run_in_thread(run_ruff_lint, python_code),
+    )
+    logger.info("SafeASTChecker and compilation completed successfully")
+    _cache_put(_VALIDATION_CACHE, key, (True, compile_check_result, status, diagnostics))
+    return status, diagnostics
+
+
+async def validate_generated_code_async(code: str, max_retries: int = MAX_FIX_RETRIES):
+    """Async variant of validate_generated_code.
+
+    The AST checks and ruff run concurrently on worker threads,
+    and the ruff-fix prompt is sent to Ollama without blocking the event loop.
+    """
+    from agents.code_generator import MODEL, query_ollama_async
+
+    python_code = extract_python_code(code)
+
+    for attempt in range(max_retries + 1):
+        status, diagnostics = await _run_checks_async(python_code)
+        if status:
+            logger.info("No ruff lint suggestions found.")
+            logger.info(f"Generated production ready code:\n {python_code}")
+            return True
+
+        logger.info(f"Found ruff lint suggestions as follows: {diagnostics}\n")
+        if attempt == max_retries:
+            break
+
+        logger.info(f"Requesting ruff fixes from LLM (attempt {attempt + 1} of {max_retries})")
+        new_prompt = get_ruff_fix_prompt(python_code, diagnostics)
+        llm_result = await query_ollama_async(new_prompt, MODEL)
+        python_code = extract_python_code(llm_result)
+
+    logger.warning(f"Ruff issues remain after {max_retries} fix attempts")
+    return False
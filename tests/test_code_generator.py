@@ -0,0 +1,100 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents import code_generator
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(code_generator, "GENERATION_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(code_generator, "_GENERATION_CACHE", OrderedDict())
+    return tmp_path
+
+
+@pytest.mark.parametrize("llm_output", [
+    "Sorry, I cannot help with that.",
+    "```python\nimport os\nos.system('ls')\n```",
+])
+def test_generate_spark_job_does_not_cache_unusable_output(cache_dir, monkeypatch, llm_output):
+    monkeypatch.setattr(code_generator, "query_ollama", lambda prompt, model: llm_output)
+
+    assert code_generator.generate_spark_job("read a csv") == llm_output
+    assert os.listdir(cache_dir) == []
+    assert code_generator._GENERATION_CACHE == {}
+
+
+def test_generate_spark_job_caches_valid_output(cache_dir, monkeypatch):
+    llm_output = "```python\ndf = spark.read.csv('a.csv')\n```"
+    monkeypatch.setattr(code_generator, "query_ollama", lambda prompt, model: llm_output)
+    code_generator.generate_spark_job("read a csv")
+
+    monkeypatch.setattr(code_generator, "query_ollama", lambda prompt, model: pytest.fail("cache miss"))
+    code_generator._GENERATION_CACHE.clear()
+    assert code_generator.generate_spark_job("read a csv") == llm_output
+
+
+def test_store_generation_from_concurrent_threads(cache_dir):
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: code_generator._store_generation("key", f"result {i}"), range(32)))
+
+    assert os.listdir(cache_dir) == ["key.txt"]
+
+
+def test_generation_cache_evicts_least_recently_used(cache_dir, monkeypatch):
+    monkeypatch.setattr(code_generator, "GENERATION_CACHE_SIZE", 2)
+    code_generator._remember_generation("a", "result a")
+    code_generator._remember_generation("b", "result b")
+    assert code_generator._load_cached_generation("a") == "result a"
+    code_generator._remember_generation("c", "result c")
+
+    assert list(code_generator._GENERATION_CACHE) == ["a", "c"]
+
+
+def test_generation_cache_from_concurrent_threads(cache_dir, monkeypatch):
+    monkeypatch.setattr(code_generator, "GENERATION_CACHE_SIZE", 8)
+
+    def worker(i):
+        code_generator._remember_generation(f"key {i}", f"result {i}")
+        code_generator._load_cached_generation(f"key {i - 1}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(worker, range(2000)))
+
+    assert len(code_generator._GENERATION_CACHE) == 8
+
+
+class _FakeResponse:
+    status_code = 200
+
+    def __init__(self, lines):
+        self._lines = lines
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.closed = True
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self._lines)
+
+
+def test_query_ollama_joins_streamed_chunks(monkeypatch):
+    response = _FakeResponse([b'{"response": "a"}', b"", b'{"response": "b", "done": true}'])
+    monkeypatch.setattr(code_generator._SESSION, "post", lambda *args, **kwargs: response)
+
+    assert code_generator.query_ollama("prompt", "model") == "ab"
+    assert response.closed
+
+
+def test_query_ollama_closes_response_on_bad_chunk(monkeypatch):
+    response = _FakeResponse([b'{"response": "a"}', b"not json"])
+    monkeypatch.setattr(code_generator._SESSION, "post", lambda *args, **kwargs: response)
+
+    with pytest.raises(ValueError):
+        code_generator.query_ollama("prompt", "model")
+    assert response.closed
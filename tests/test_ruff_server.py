@@ -0,0 +1,68 @@
+import io
+import os
+import shutil
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from agents import ruff_server
+from agents.validator import run_ruff_lint
+
+pytestmark = pytest.mark.skipif(shutil.which("ruff") is None, reason="ruff is not installed")
+
+
+@pytest.fixture
+def fresh_server(monkeypatch):
+    monkeypatch.setattr(ruff_server, "_SERVER", None)
+    yield
+    if ruff_server._SERVER is not None:
+        ruff_server._SERVER.close()
+
+
+def test_concurrent_first_calls_start_one_server(fresh_server, monkeypatch):
+    started = []
+    real_init = ruff_server.RuffServer.__init__
+
+    def counting_init(self):
+        started.append(self)
+        real_init(self)
+
+    monkeypatch.setattr(ruff_server.RuffServer, "__init__", counting_init)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        servers = list(pool.map(lambda _: ruff_server.get_ruff_server(), range(6)))
+
+    assert len(started) == 1
+    assert all(server is servers[0] for server in servers)
+
+
+def test_run_ruff_lint_falls_back_when_server_dies(fresh_server):
+    server = ruff_server.get_ruff_server()
+    server._process.kill()
+    server._process.wait()
+    ## make get_ruff_server hand out the dead server once
+    server._process.poll = lambda: None
+
+    assert run_ruff_lint("import os\n") == (False, "1:8: F401 `os` imported but unused")
+
+
+def test_stalled_server_times_out_and_falls_back(fresh_server, monkeypatch):
+    monkeypatch.setattr(ruff_server, "REQUEST_TIMEOUT", 0.5)
+    server = ruff_server.get_ruff_server()
+    os.kill(server._process.pid, signal.SIGSTOP)
+
+    assert run_ruff_lint("import os\n") == (False, "1:8: F401 `os` imported but unused")
+    assert not server.is_alive()
+    assert ruff_server.get_ruff_server() is not server
+
+
+def test_message_without_content_length_kills_server(fresh_server):
+    server = ruff_server.get_ruff_server()
+    real_stdout = server._process.stdout
+    server._process.stdout = io.BytesIO(b"X-Other: 1\r\n\r\n{}")
+
+    with pytest.raises(RuntimeError, match="Content-Length"):
+        server.check("x = 1\n")
+    real_stdout.close()
+    assert not server.is_alive()
+    assert ruff_server.get_ruff_server() is not server
@@ -0,0 +1,100 @@
+import ast
+import itertools
+import random
+
+import pytest
+
+from agents.validator import (
+    UnsafeCodeError,
+    _check_statements,
+    check_safe,
+    extract_python_code,
+    may_be_unsafe,
+)
+
+
+# ============ SAFE AST CHECKER ==============================
+@pytest.mark.parametrize("code", [
+    'x = getattr(spark, "ev" "al")\n',
+    'name = ("o"\n  "s")\n',
+    'x = f"e" f"val"\n',
+    'x = ("o"  # split\n  "s")\n',
+    'x = getattr(spark, "ev"\x0c"al")\n',
+    'x = ("o"\x0c"s")\n',
+])
+def test_check_safe_rejects_implicitly_concatenated_strings(code):
+    with pytest.raises(UnsafeCodeError, match="Forbidden string literal"):
+        _check_statements(ast.parse(code).body)
+    with pytest.raises(UnsafeCodeError, match="Forbidden string literal"):
+        check_safe(code)
+
+
+## Fragments that mix forbidden words, look-alikes, string syntax and every
+## whitespace the tokenizer accepts between tokens, so the generated snippets
+## exercise word boundaries and literal folding.
+_FRAGMENTS = [
+    "eval", "exec", "os", "sys", "run", "unlink", "__builtins__", "importlib",
+    "cost", "os_", "_os", "running", "x", "spark", "'os'", '"run"', '"ev"', "'al'",
+    "f'e'", 'f"val"', "'o'", '"s"', "(", ")", "f(", ".", ",", " ", "\t", "\x0c", "\n", "\r\n", "=", "1",
+    "import ", "from ", "# c", '"""',
+]
+
+
+def _rejected_by_full_scan(tree):
+    try:
+        _check_statements(tree.body)
+    except UnsafeCodeError:
+        return True
+    return False
+
+
+def test_text_shortcut_never_skips_code_the_full_scan_rejects():
+    rng = random.Random(1234)
+    checked = 0
+    for _ in range(20000):
+        code = "".join(rng.choice(_FRAGMENTS) for _ in range(rng.randint(1, 8)))
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            continue
+        checked += 1
+        if not may_be_unsafe(code):
+            assert not _rejected_by_full_scan(tree), code
+    assert checked > 1000
+
+
+# =================== EXTRACT PYTHON CODE ======================
+@pytest.mark.parametrize("llm_output, expected", [
+    ("```python\nprint(1)\n```\nThen run:\n```\nspark-submit job.py\n```", "print(1)\n"),
+    ("```\nx = 1\n```", "x = 1\n"),
+    ("```python\r\nprint(1)\r\n```", "print(1)\r\n"),
+    ("```python print(1)```", "print(1)"),
+    ("```PySpark\nspark.read\n```\n```bash\nls\n```", "spark.read\n"),
+    ("Here:\n\n    import x\n    y = 1\n\nthanks", "import x\ny = 1\n"),
+])
+def test_extract_python_code(llm_output, expected):
+    assert extract_python_code(llm_output) == expected
+
+
+@pytest.mark.parametrize("llm_output", [
+    "def f():\n    return 1\n",
+    "Here:\n```python\ndef f():\n    return 1\n",
+])
+def test_extract_python_code_ignores_nested_or_unfenced_indentation(llm_output):
+    with pytest.raises(ValueError):
+        extract_python_code(llm_output)
+
+
+_SEPARATORS = [" ", "\t", "\x0c", "\n", "\r\n", "\r", "  # c\n", "\x0c\n\t"]
+
+
+@pytest.mark.parametrize("separator", _SEPARATORS)
+def test_text_shortcut_never_skips_adjacent_literals(separator):
+    for first_prefix, second_prefix in itertools.product(["", "f", "r", "u"], repeat=2):
+        for first_quote, second_quote in itertools.product(["'", '"', "'''"], repeat=2):
+            code = (
+                f"x = ({first_prefix}{first_quote}o{first_quote}{separator}"
+                f"{second_prefix}{second_quote}s{second_quote})\n"
+            )
+            assert _rejected_by_full_scan(ast.parse(code)), code
+            assert may_be_unsafe(code), code